@@ -33,6 +33,12 @@ def combine_all_json_to_csv(input_folder, output_csv_path):
             with open(json_file, 'r', encoding='utf-8') as file:
                 data = json.load(file)
             
+            # Tag every row with its source document so train/validation splits
+            # never have to guess where one document ends
+            document = json_file.stem[:-len("_dataset")] if json_file.stem.endswith("_dataset") else json_file.stem
+            for record in data:
+                record["document"] = document
+            
             records_count = len(data)
             all_data.extend(data)
             total_records += records_count
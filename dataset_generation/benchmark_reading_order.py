@@ -0,0 +1,139 @@
+"""
+Benchmark column-aware reading order in calculate_text_features.
+
+Runs calculate_text_features on dense synthetic two/three-column pages (and on
+any Adobe structuredData.json files given on the command line), timing the
+column-aware path against the original single-column ordering (reproduced
+below as legacy_text_features) and reporting how much the distance feature
+columns change.
+
+Usage: python benchmark_reading_order.py [structuredData.json ...]
+"""
+import sys, json, time, random
+from collections import defaultdict
+
+from text_features import calculate_text_features, _indentation_stats
+
+DISTANCE_COLUMNS = ['distance_to_previous_line', 'distance_to_next_line', 'line_spacing']
+
+def synthetic_page(columns=2, lines_per_column=70, seed=0):
+    """A dense multi-column page: full-width title, offset column baselines, footer"""
+    rng = random.Random(seed)
+    left, right, gutter = 54, 558, 18
+    col_width = (right - left - gutter * (columns - 1)) / columns
+    elements = [{"Text": "A Synthetic Multi-Column Paper Title", "Bounds": [left, 760, right, 778]}]
+    for c in range(columns):
+        x = left + c * (col_width + gutter)
+        y = 730 - c * 3.5  # baselines of neighbouring columns never line up exactly
+        for i in range(lines_per_column):
+            indent = 10 if rng.random() < 0.1 else 0
+            elements.append({"Text": f"column {c} line {i} body text",
+                             "Bounds": [x + indent, y, x + col_width - rng.uniform(0, 20), y + 8]})
+            y -= 9.6 + (6 if rng.random() < 0.05 else 0)  # occasional paragraph gap
+    elements.append({"Text": "Page footer spanning the full width", "Bounds": [left, 30, right, 38]})
+    # Line number sitting in the gutter between the first two columns
+    gutter_x = left + col_width + gutter / 2
+    elements.append({"Text": "12", "Bounds": [gutter_x - 5, 400, gutter_x + 5, 408]})
+    rng.shuffle(elements)  # extraction order is not reading order
+    return elements
+
+def legacy_text_features(elements_by_page):
+    """The original single-column pass: one top-to-bottom order per page"""
+    def bounds(elem):
+        return elem.get("Bounds", [0, 0, 0, 0])
+    def valid(elem):
+        return len(elem.get("Text", "").strip()) >= 2 and len(bounds(elem)) >= 4
+    
+    enhanced_elements = []
+    for elements in elements_by_page.values():
+        elements.sort(key=lambda e: -bounds(e)[1])
+        left_margin, indentation_unit = _indentation_stats([bounds(e)[0] for e in elements if len(bounds(e)) >= 4])
+        
+        for i, elem in enumerate(elements):
+            if not valid(elem):
+                continue
+            x, y, x2, y2 = bounds(elem)
+            # Nearest valid line above/below in page order, whatever column it is in
+            prev = next((abs(bounds(elements[j])[1] - y) for j in range(i - 1, -1, -1) if valid(elements[j])), None)
+            nxt = next((abs(y - bounds(elements[j])[1]) for j in range(i + 1, len(elements)) if valid(elements[j])), None)
+            try:
+                indentation_level = max(0, round((x - left_margin) / indentation_unit))
+            except (ZeroDivisionError, ValueError):
+                indentation_level = 0
+            if prev is None and i == 0:
+                line_spacing = nxt if nxt is not None else 0
+            else:
+                line_spacing = prev if prev is not None else 0
+            
+            enhanced_elem = elem.copy()
+            enhanced_elem.update({
+                'distance_to_previous_line': prev,
+                'distance_to_next_line': nxt,
+                'line_spacing': line_spacing,
+                'indentation_level': indentation_level,
+                'is_first_line_on_page': (i == 0),
+                'computed_x': x,
+                'computed_y': y,
+                'computed_width': x2 - x,
+                'computed_height': y2 - y,
+                'page_left_margin': left_margin,
+                'page_indentation_unit': indentation_unit
+            })
+            enhanced_elements.append(enhanced_elem)
+    return enhanced_elements
+
+def load_pages(paths):
+    pages = []
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            by_page = defaultdict(list)
+            for elem in json.load(f).get("elements", []):
+                by_page[elem.get("Page", 1)].append(elem)
+            pages.extend(by_page.values())
+    return pages
+
+def run(pages, features, repeats=5):
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = features({i: list(p) for i, p in enumerate(pages)})
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+def compare(pages, name):
+    # Tag every element with its page so rows can be matched between the two runs
+    pages = [[dict(elem, BenchPage=i) for elem in page] for i, page in enumerate(pages)]
+    legacy, t_legacy = run(pages, legacy_text_features)
+    aware, t_aware = run(pages, calculate_text_features)
+    lines = sum(len(p) for p in pages)
+    
+    print(f"\n📄 {name}: {len(pages)} pages, {lines} elements")
+    print(f"  ⏱️  single-column: {t_legacy * 1000:.1f} ms, column-aware: {t_aware * 1000:.1f} ms "
+          f"({t_aware / max(t_legacy, 1e-9):.2f}x)")
+    
+    # Match rows by element identity (page + text + bounds), reading order differs between the two
+    def key(elem):
+        return (elem["BenchPage"], elem.get("Text"), tuple(elem["Bounds"]))
+    before = {key(e): e for e in legacy}
+    for col in DISTANCE_COLUMNS:
+        diffs = []
+        for elem in aware:
+            old, new = before[key(elem)].get(col), elem.get(col)
+            if old is None or new is None:
+                diffs.append(0.0 if old is new else float('nan'))
+            else:
+                diffs.append(abs(new - old))
+        changed = sum(1 for d in diffs if d != 0)
+        measured = [d for d in diffs if d == d]
+        mean = sum(measured) / len(measured) if measured else 0
+        print(f"  📐 {col}: {changed}/{len(diffs)} rows changed, mean |Δ| {mean:.2f}pt")
+    columns = sorted({e['column_index'] for e in aware})
+    print(f"  🧭 column indices seen: {columns}")
+
+if __name__ == "__main__":
+    for columns in (2, 3):
+        pages = [synthetic_page(columns=columns, seed=s) for s in range(50)]
+        compare(pages, f"synthetic {columns}-column")
+    
+    if len(sys.argv) > 1:
+        compare(load_pages(sys.argv[1:]), "structuredData.json input")
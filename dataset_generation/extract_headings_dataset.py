@@ -1,7 +1,7 @@
-import os, json, zipfile, tempfile, re
+import os, sys, json, zipfile, tempfile, re
 from pathlib import Path
 from collections import defaultdict
-import math
+import math, time
 
 from adobe.pdfservices.operation.auth.service_principal_credentials import ServicePrincipalCredentials
 from adobe.pdfservices.operation.pdf_services import PDFServices
@@ -11,11 +11,24 @@ from adobe.pdfservices.operation.pdfjobs.result.extract_pdf_result import Extrac
 from adobe.pdfservices.operation.pdfjobs.params.extract_pdf.extract_element_type import ExtractElementType
 from adobe.pdfservices.operation.pdfjobs.params.extract_pdf.extract_pdf_params import ExtractPDFParams
 
+from work_queue import WorkQueue, print_status
+from pdf_slimming import prepare_upload
+from result_store import ResultStore
+from pdf_outline import outline_dataset
+from text_features import calculate_text_features
+
 # Configuration
 CRED_PATH = Path(__file__).parent / "pdfservices-api-credentials.json"
 RAW_PDFS = Path(__file__).parent.parent / "raw_pdfs"
 OUT_DIR = Path(__file__).parent.parent / "processed_data"
 OUT_DIR.mkdir(exist_ok=True)
+SLIM_PDFS = True  # strip images from text pages before upload (needs pikepdf)
+COMPARE_UNSLIMMED_UPLOAD = "--compare-upload" in sys.argv  # also upload the original, to measure what slimming saves
+# Take headings from PDF bookmarks instead of Adobe when available (needs pikepdf).
+# Opt-in: outline rows have no typography, so training leaves them out and every
+# fast-path document is a document missing from the training set. Only for runs
+# that just need the headings.
+USE_OUTLINE_FAST_PATH = False
 
 def load_pdfservices(creds_path):
     creds = json.load(open(creds_path))
@@ -25,14 +38,45 @@ def load_pdfservices(creds_path):
     )
     return PDFServices(credentials=spc)
 
-def extract_structured_data(pdf_services, pdf_path: Path):
+def _timed_upload(pdf_services, path):
+    """Upload one file, streamed from disk; returns (asset, seconds)"""
+    start = time.perf_counter()
+    with open(path, "rb") as f:
+        asset = pdf_services.upload(input_stream=f, mime_type=PDFServicesMediaType.PDF)
+    return asset, time.perf_counter() - start
+
+def extract_structured_data(pdf_services, pdf_path: Path, slim=SLIM_PDFS, compare=COMPARE_UNSLIMMED_UPLOAD):
     """Extract with enhanced document analysis - FIXED API parameters"""
     print(f"  → Processing {pdf_path.name} with document analysis...")
     
-    with open(pdf_path, "rb") as f:
-        data = f.read()
+    # Only the text layer is extracted, so images on text pages need not be uploaded
+    start = time.perf_counter()
+    if slim:
+        upload_path, slim_stats, cleanup = prepare_upload(pdf_path)
+    else:
+        upload_path, slim_stats, cleanup = pdf_path, None, lambda: None
+    slim_seconds = time.perf_counter() - start
+    
+    try:
+        asset, upload_seconds = _timed_upload(pdf_services, upload_path)
+    finally:
+        cleanup()
     
-    asset = pdf_services.upload(input_stream=data, mime_type=PDFServicesMediaType.PDF)
+    if slim_stats:
+        original_mb = slim_stats["original_bytes"] / (1024 * 1024)
+        sent_mb = slim_stats["slimmed_bytes"] / (1024 * 1024)
+        saved = slim_stats["bytes_saved"] / max(slim_stats["original_bytes"], 1)
+        print(f"    📦 Upload: {original_mb:.2f} MB → {sent_mb:.2f} MB ({saved:.0%} saved, "
+              f"{slim_stats['images_replaced']} images stripped, {slim_stats['scanned_pages']} scanned or sparse-text pages kept)")
+        print(f"    ⏱️  Slimming {slim_seconds:.2f}s + upload {upload_seconds:.2f}s = {slim_seconds + upload_seconds:.2f}s")
+        if compare and slim_stats["bytes_saved"]:
+            # Opt-in: a second, unused upload of the original file for a measured comparison
+            _, original_seconds = _timed_upload(pdf_services, pdf_path)
+            delta = original_seconds - (slim_seconds + upload_seconds)
+            print(f"    ⏱️  Unslimmed upload {original_seconds:.2f}s → slimming "
+                  f"{'saved' if delta >= 0 else 'cost'} {abs(delta):.2f}s")
+    else:
+        print(f"    ⏱️  Upload took {upload_seconds:.2f}s")
     
     # FIXED: Use only valid Adobe PDF Extract API parameters
     try:
@@ -62,118 +106,6 @@ def extract_structured_data(pdf_services, pdf_path: Path):
     os.unlink(tmp.name)
     return json.loads(raw)
 
-def calculate_text_features(elements_by_page):
-    """FIXED: Calculate advanced text features with proper error handling for empty sequences"""
-    enhanced_elements = []
-    
-    for page_num, elements in elements_by_page.items():
-        if not elements:
-            continue
-            
-        # Sort elements by Y coordinate (top to bottom) - FIXED sorting
-        elements.sort(key=lambda x: -x.get('Bounds', [0, 0, 0, 0])[1])
-        
-        # FIXED: Calculate page-level statistics for better indentation with error handling
-        x_coordinates = []
-        for elem in elements:
-            bounds = elem.get("Bounds", [0, 0, 0, 0])
-            if len(bounds) >= 4:
-                x_coordinates.append(bounds[0])
-        
-        # Calculate common left margins and indentation unit with proper error handling
-        if x_coordinates:
-            sorted_x = sorted(set(x_coordinates))
-            left_margin = min(sorted_x)
-            
-            # FIXED: Calculate indentation unit with proper empty sequence handling
-            if len(sorted_x) > 1:
-                x_diffs = [sorted_x[i] - sorted_x[i-1] for i in range(1, len(sorted_x))]
-                # FIXED: Filter and ensure we have valid differences
-                valid_diffs = [diff for diff in x_diffs if diff > 5]
-                if valid_diffs:
-                    indentation_unit = min(valid_diffs)
-                else:
-                    # No valid differences found, use default
-                    indentation_unit = 20
-            else:
-                indentation_unit = 20
-        else:
-            left_margin = 0
-            indentation_unit = 20
-        
-        for i, elem in enumerate(elements):
-            text = elem.get("Text", "").strip()
-            if not text or len(text) < 2:
-                continue
-                
-            bounds = elem.get("Bounds", [0, 0, 0, 0])
-            if len(bounds) < 4:
-                continue
-                
-            x, y, x2, y2 = bounds
-            
-            # FIXED: Calculate distances with improved logic
-            prev_distance = None
-            next_distance = None
-            
-            # Calculate distance to previous element
-            if i > 0:
-                for j in range(i-1, -1, -1):  # Look backward for valid element
-                    prev_elem = elements[j]
-                    prev_text = prev_elem.get("Text", "").strip()
-                    prev_bounds = prev_elem.get("Bounds", [0, 0, 0, 0])
-                    
-                    if prev_text and len(prev_text) >= 2 and len(prev_bounds) >= 4:
-                        prev_y = prev_bounds[1]
-                        prev_distance = abs(prev_y - y)
-                        break
-            
-            # Calculate distance to next element
-            if i < len(elements) - 1:
-                for j in range(i+1, len(elements)):  # Look forward for valid element
-                    next_elem = elements[j]
-                    next_text = next_elem.get("Text", "").strip()
-                    next_bounds = next_elem.get("Bounds", [0, 0, 0, 0])
-                    
-                    if next_text and len(next_text) >= 2 and len(next_bounds) >= 4:
-                        next_y = next_bounds[1]
-                        next_distance = abs(y - next_y)
-                        break
-            
-            # FIXED: Improved indentation calculation with error handling
-            try:
-                indentation_level = max(0, round((x - left_margin) / indentation_unit))
-            except (ZeroDivisionError, ValueError):
-                indentation_level = 0
-            
-            # FIXED: Better line spacing calculation
-            # For first element on page, use a reasonable default or calculate from next element
-            if prev_distance is None and i == 0:
-                # First element on page - use distance to next element or default
-                line_spacing = next_distance if next_distance is not None else 0
-            else:
-                line_spacing = prev_distance if prev_distance is not None else 0
-            
-            # Enhanced element with calculated features
-            enhanced_elem = elem.copy()
-            enhanced_elem.update({
-                'distance_to_previous_line': prev_distance,
-                'distance_to_next_line': next_distance,
-                'line_spacing': line_spacing,  # FIXED: Proper line spacing
-                'indentation_level': indentation_level,  # FIXED: Improved indentation
-                'is_first_line_on_page': (i == 0),
-                'computed_x': x,
-                'computed_y': y,
-                'computed_width': x2 - x,
-                'computed_height': y2 - y,
-                'page_left_margin': left_margin,  # Additional context
-                'page_indentation_unit': indentation_unit  # Additional context
-            })
-            
-            enhanced_elements.append(enhanced_elem)
-    
-    return enhanced_elements
-
 def build_comprehensive_dataset(adobe_data, pdf_name):
     """Build dataset with all required features - FIXED spacing calculations"""
     elems = adobe_data.get("elements", [])
@@ -371,7 +303,8 @@ def build_comprehensive_dataset(adobe_data, pdf_name):
                     "distance_to_previous_line": elem.get('distance_to_previous_line'),  # FIXED: Keep None for first elements
                     "distance_to_next_line": elem.get('distance_to_next_line'),  # FIXED: Keep None where appropriate
                     "label": label,
-                    "heading_score": heading_score
+                    "heading_score": heading_score,
+                    "source": "adobe"  # vs "outline" rows from the fast path
                 }
                 
                 features.append(feature)
@@ -379,17 +312,70 @@ def build_comprehensive_dataset(adobe_data, pdf_name):
     
     return features
 
+def extract_dataset(pdf_services, pdf_path: Path, timings):
+    """Heading rows for one PDF: from its outline when rich enough, otherwise via Adobe extraction"""
+    start = time.perf_counter()
+    feats = outline_dataset(pdf_path) if USE_OUTLINE_FAST_PATH else None
+    
+    if feats is not None:
+        print(f"  ⚡ Outline fast path: {len(feats)} rows from bookmarks, remote extraction skipped")
+        timings["fast_docs"] += 1
+        timings["fast_seconds"] += time.perf_counter() - start
+        return feats
+    
+    data = extract_structured_data(pdf_services, pdf_path)
+    feats = build_comprehensive_dataset(data, pdf_path.name)
+    timings["remote_docs"] += 1
+    timings["remote_seconds"] += time.perf_counter() - start
+    return feats
+
+def new_timings():
+    return {"fast_docs": 0, "fast_seconds": 0.0, "remote_docs": 0, "remote_seconds": 0.0}
+
+def print_fast_path_report(timings):
+    total = timings["fast_docs"] + timings["remote_docs"]
+    if not total:
+        return
+    print(f"\n⚡ Outline fast path: {timings['fast_docs']}/{total} documents ({timings['fast_docs'] / total:.0%})")
+    if timings["fast_docs"]:
+        print(f"  ⚠️  {timings['fast_docs']} documents have outline rows only; the training feature store "
+              f"excludes them (EXCLUDED_SOURCES in training/feature_engineering.py)")
+    if timings["fast_docs"] and timings["remote_docs"]:
+        # Each fast-path document would otherwise have cost an average remote round trip
+        remote_avg = timings["remote_seconds"] / timings["remote_docs"]
+        saved = timings["fast_docs"] * remote_avg - timings["fast_seconds"]
+        print(f"  ⏱️  Avg remote: {remote_avg:.1f}s/doc, avg fast path: "
+              f"{timings['fast_seconds'] / timings['fast_docs']:.2f}s/doc, est. time saved: {saved:.1f}s")
+
+def run_worker():
+    """Work-queue mode: run as many of these as you like, on any node sharing RAW_PDFS/OUT_DIR.
+    Workers only write JSON; load it with `python result_store.py import` from one process."""
+    ps = load_pdfservices(CRED_PATH)
+    print("✅ Adobe PDF Services ready")
+    timings = new_timings()
+    
+    def process(pdf):
+        return extract_dataset(ps, pdf, timings)
+    
+    WorkQueue(RAW_PDFS, OUT_DIR, counters=timings).run(process)
+    status = print_status(RAW_PDFS, OUT_DIR)
+    # Fast-path share and time saved across every worker, not just this one
+    print_fast_path_report({**new_timings(), **status["counters"]})
+
 def main():
+    if "--worker" in sys.argv:
+        return run_worker()
+    
     ps = load_pdfservices(CRED_PATH)
     print("✅ Adobe PDF Services ready")
     
     total_features = 0
+    timings = new_timings()
     
     for pdf in sorted(RAW_PDFS.glob("*.pdf")):
         print(f"\n📄 Processing {pdf.name}")
         try:
-            data = extract_structured_data(ps, pdf)
-            feats = build_comprehensive_dataset(data, pdf.name)
+            feats = extract_dataset(ps, pdf, timings)
             
             out = OUT_DIR / f"{pdf.stem}_dataset.json"
             with open(out, "w", encoding="utf-8") as f:
@@ -409,6 +395,13 @@ def main():
             import traceback
             traceback.print_exc()
     
+    # Single writer: load this run's JSON into the result store incrementally
+    try:
+        with ResultStore() as store:
+            store.import_json_dir(OUT_DIR)
+    except Exception as e:
+        print(f"❌ Result store import failed (JSON results are unaffected): {e}")
+    print_fast_path_report(timings)
     print(f"\n📊 Total features extracted: {total_features}")
 
 if __name__ == "__main__":
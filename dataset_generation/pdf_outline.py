@@ -0,0 +1,136 @@
+"""
+Fast path: heading rows straight from a PDF's embedded outline (bookmarks).
+
+Many PDFs already carry their title and H1/H2/H3 structure as an outline with
+page destinations. When that outline is rich enough, outline_dataset() turns it
+into rows with the same schema build_comprehensive_dataset() produces, and the
+Adobe upload-extract-poll round trip can be skipped entirely. The fast path is
+opt-in (USE_OUTLINE_FAST_PATH in extract_headings_dataset.py), since the rows
+it produces are not used for training.
+
+Fields the outline cannot provide (fonts, sizes, spacing, text box position)
+are left as None. Outline rows carry source="outline" (extracted rows carry
+source="adobe") so that training can exclude them: combine_json_to_csv.py
+turns the missing values into 0, which would otherwise read as "small,
+non-bold heading". The bookmark's view position is not a text box, so it is
+not written into x_coordinate/y_coordinate.
+
+Requires pikepdf (pip install pikepdf); without it every PDF takes the remote path.
+"""
+import re
+from pathlib import Path
+
+try:
+    import pikepdf
+except ImportError:  # optional dependency
+    pikepdf = None
+
+OUTLINE_MIN_ENTRIES = 3  # fewer bookmarks than this is not a usable heading structure
+OUTLINE_MIN_RESOLVED = 0.9  # share of bookmarks that must point at a page
+LEVEL_LABELS = ["H1", "H2", "H3", "H4"]  # outline depth -> label; deeper entries are dropped
+
+def _named_destinations(pdf):
+    """Named destinations from the /Dests name tree and the older /Dests dictionary"""
+    names = {}
+    root = pdf.Root
+    if "/Dests" in root:
+        for key, value in root.Dests.items():
+            names[str(key).lstrip("/")] = value
+    if "/Names" in root and "/Dests" in root.Names:
+        for key, value in pikepdf.NameTree(root.Names.Dests).items():
+            names[str(key)] = value
+    return names
+
+def _resolve(item, named, page_index):
+    """1-indexed page number of an outline item, or None if it has no page destination"""
+    dest = item.destination
+    if dest is None and item.action is not None and item.action.get("/S") == "/GoTo":
+        dest = item.action.get("/D")
+    if isinstance(dest, (pikepdf.String, pikepdf.Name, str)):
+        dest = named.get(str(dest).lstrip("/"))
+    if isinstance(dest, pikepdf.Dictionary):
+        dest = dest.get("/D")
+    if not isinstance(dest, pikepdf.Array) or len(dest) < 2:
+        return None
+
+    page = dest[0]
+    if isinstance(page, int):  # remote-style destinations use a page index
+        index = int(page)
+    else:
+        index = page_index.get(page.objgen)
+    if index is None:
+        return None
+    return index + 1  # 1-indexed, like build_comprehensive_dataset
+
+def _walk(items, depth, named, page_index, out):
+    for item in items:
+        out.append((depth, str(item.title or "").strip(), _resolve(item, named, page_index)))
+        _walk(item.children, depth + 1, named, page_index, out)
+
+def _row(text, label, page_number):
+    return {
+        "text_content": text,
+        "font_size": None,
+        "font_name": None,
+        "is_bold": None,
+        "is_italic": None,
+        "is_all_caps": text.isupper() and len(text) > 1,
+        "x_coordinate": None,
+        "y_coordinate": None,
+        "width": None,
+        "height": None,
+        "page_number": page_number,
+        "line_spacing": None,
+        "indentation_level": None,
+        "ends_with_colon": text.endswith(":"),
+        "contains_numbering_bullets": bool(re.match(r"^(\d+[\.\)]|\-|\•|\*)\s+", text)),
+        "is_first_line_on_page": None,
+        "distance_to_previous_line": None,
+        "distance_to_next_line": None,
+        "label": label,
+        "heading_score": None,
+        "source": "outline",
+    }
+
+def outline_dataset(pdf_path: Path):
+    """
+    Heading rows from the PDF outline, or None when the outline is missing or
+    too thin to trust (the caller then falls back to remote extraction).
+    """
+    if pikepdf is None:
+        return None
+
+    try:
+        with pikepdf.open(pdf_path) as pdf:
+            page_index = {page.obj.objgen: i for i, page in enumerate(pdf.pages)}
+            named = _named_destinations(pdf)
+            entries = []
+            with pdf.open_outline() as outline:
+                _walk(outline.root, 0, named, page_index, entries)
+            title = str(pdf.docinfo.get("/Title", "")).strip() if pdf.docinfo else ""
+    except Exception as e:
+        print(f"    ⚠️  Could not read outline: {e}")
+        return None
+
+    entries = [(depth, text, loc) for depth, text, loc in entries if text]
+    resolved = [e for e in entries if e[2] is not None]
+    if len(resolved) < OUTLINE_MIN_ENTRIES or len(resolved) < OUTLINE_MIN_RESOLVED * len(entries):
+        return None
+
+    # A single top-level bookmark wrapping everything is the document title
+    top_level = [e for e in resolved if e[0] == 0]
+    shift = 0
+    rows = []
+    if len(top_level) == 1 and len(resolved) > 1:
+        depth, text, page_number = top_level[0]
+        rows.append(_row(text, "title", page_number))
+        resolved = [e for e in resolved if e is not top_level[0]]
+        shift = 1
+    elif title and not title.lower().endswith((".pdf", ".doc", ".docx")):
+        rows.append(_row(title, "title", 1))
+
+    for depth, text, page_number in resolved:
+        level = depth - shift
+        if 0 <= level < len(LEVEL_LABELS):
+            rows.append(_row(text, LEVEL_LABELS[level], page_number))
+    return rows
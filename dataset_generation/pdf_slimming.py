@@ -0,0 +1,134 @@
+"""
+Pre-upload PDF slimming.
+
+The extraction job only asks Adobe for ExtractElementType.TEXT, so embedded
+images on pages that already carry a text layer are dead weight on the upload.
+slim_pdf() replaces those image streams with a 1x1 placeholder (the XObject
+stays in place, so content streams, text positions and Bounds are unchanged),
+drops page thumbnails and unreferenced resources, and rewrites the file with
+compressed object streams.
+
+Only pages with real text coverage (at least MIN_TEXT_CHARS characters drawn
+by text operators, including inside form XObjects) are slimmed. Scanned pages
+often carry a font just for a stamped header, Bates number or page number;
+those, and pages with no text at all, are left untouched because Adobe has to
+OCR their images to find the body text.
+
+Requires pikepdf (pip install pikepdf); without it slimming is skipped.
+"""
+import os, shutil, tempfile
+from pathlib import Path
+
+try:
+    import pikepdf
+except ImportError:  # optional dependency
+    pikepdf = None
+
+MIN_IMAGE_BYTES = 4096  # images smaller than this are not worth replacing
+MIN_TEXT_CHARS = 200  # text drawn on a page before its images count as decoration
+
+TEXT_OPERATORS = {"Tj", "TJ", "'", '"'}
+
+def _text_chars(stream, resources, seen) -> int:
+    """Characters shown by text operators in a content stream, recursing into form XObjects"""
+    chars = 0
+    forms = resources.get("/XObject", {}) if resources is not None else {}
+    for operands, operator in pikepdf.parse_content_stream(stream):
+        op = str(operator)
+        if op in TEXT_OPERATORS:
+            for operand in operands:
+                items = operand if isinstance(operand, pikepdf.Array) else [operand]
+                chars += sum(len(bytes(item)) for item in items if isinstance(item, pikepdf.String))
+        elif op == "Do" and operands:
+            xobj = forms.get(str(operands[0]))
+            if xobj is not None and xobj.get("/Subtype") == "/Form" and xobj.objgen not in seen:
+                seen.add(xobj.objgen)
+                chars += _text_chars(xobj, xobj.get("/Resources"), seen)
+    return chars
+
+def _page_has_text_layer(page) -> bool:
+    try:
+        return _text_chars(page, page.obj.get("/Resources"), set()) >= MIN_TEXT_CHARS
+    except pikepdf.PdfError:
+        return False  # unparseable content: do not risk blanking the only copy of the text
+
+def _blank_images(pdf, resources, seen) -> int:
+    """Replace image XObjects under resources (recursing into forms); returns images replaced"""
+    replaced = 0
+    for xobj in resources.get("/XObject", {}).values():
+        if xobj.objgen in seen:
+            continue
+        seen.add(xobj.objgen)
+
+        subtype = xobj.get("/Subtype")
+        if subtype == "/Form":
+            replaced += _blank_images(pdf, xobj.get("/Resources", {}), seen)
+        elif subtype == "/Image" and not xobj.get("/ImageMask", False):
+            length = int(xobj.get("/Length", 0))
+            if length < MIN_IMAGE_BYTES:
+                continue
+            # 1x1 grey pixel; keys that describe the old encoding must go
+            xobj.write(b"\x80")
+            for key in ("/DecodeParms", "/SMask", "/Mask", "/Decode", "/Intent", "/Alternates"):
+                if key in xobj:
+                    del xobj[key]
+            xobj.Width, xobj.Height = 1, 1
+            xobj.ColorSpace = pikepdf.Name.DeviceGray
+            xobj.BitsPerComponent = 8
+            replaced += 1
+    return replaced
+
+def slim_pdf(src: Path, dst: Path) -> dict:
+    """Write a slimmed copy of src to dst; returns size statistics"""
+    src, dst = Path(src), Path(dst)
+    stats = {"original_bytes": src.stat().st_size, "images_replaced": 0, "scanned_pages": 0}
+
+    with pikepdf.open(src) as pdf:
+        text_pages = []
+        seen = set()  # images already handled, or shared with a scanned page
+        for page in pdf.pages:
+            if "/Thumb" in page.obj:
+                del page.obj["/Thumb"]
+            if _page_has_text_layer(page):
+                text_pages.append(page)
+            else:
+                stats["scanned_pages"] += 1
+                seen.update(x.objgen for x in page.obj.get("/Resources", {}).get("/XObject", {}).values())
+
+        for page in text_pages:
+            stats["images_replaced"] += _blank_images(pdf, page.obj.get("/Resources", {}), seen)
+
+        pdf.remove_unreferenced_resources()
+        pdf.save(dst, compress_streams=True, object_stream_mode=pikepdf.ObjectStreamMode.generate)
+
+    stats["slimmed_bytes"] = dst.stat().st_size
+    # Never upload a bigger file than we started with
+    if stats["slimmed_bytes"] >= stats["original_bytes"]:
+        shutil.copyfile(src, dst)
+        stats["slimmed_bytes"] = stats["original_bytes"]
+    stats["bytes_saved"] = stats["original_bytes"] - stats["slimmed_bytes"]
+    return stats
+
+def prepare_upload(pdf_path: Path):
+    """
+    Return (path_to_upload, stats, cleanup). Falls back to the original file
+    when pikepdf is missing or the PDF cannot be rewritten.
+    """
+    pdf_path = Path(pdf_path)
+    size = pdf_path.stat().st_size
+    unchanged = {"original_bytes": size, "slimmed_bytes": size, "bytes_saved": 0,
+                 "images_replaced": 0, "scanned_pages": 0}
+
+    if pikepdf is None:
+        return pdf_path, unchanged, lambda: None
+
+    fd, tmp_name = tempfile.mkstemp(suffix=".pdf")
+    os.close(fd)
+    tmp = Path(tmp_name)
+    try:
+        stats = slim_pdf(pdf_path, tmp)
+    except Exception as e:
+        print(f"    ⚠️  Slimming failed, uploading original: {e}")
+        tmp.unlink()
+        return pdf_path, unchanged, lambda: None
+    return tmp, stats, lambda: tmp.unlink(missing_ok=True)
@@ -0,0 +1,263 @@
+"""
+SQLite result store for extracted heading rows.
+
+Every document's rows live in one indexed table, so queries like "all H1s with
+font_size above 14" or "every row from file01" are a single SQL statement
+instead of loading every processed_data/*_dataset.json with pandas.
+
+Writes are transactional per batch of documents: a document's old rows are
+replaced atomically. The store is written by a single process importing the
+committed *_dataset.json files (import_json_dir), never by the queue workers
+themselves - processed_data may sit on a shared network filesystem, where
+SQLite's locking cannot be trusted across nodes. For the same reason the
+database itself defaults to a local disk (DB_PATH, overridable with the
+RESULT_STORE_DB environment variable); only processes on that host should
+open it, and other nodes should read the exported CSV/Parquet. Imports are
+incremental, so running one after every batch of work (or periodically) is
+cheap. The store mirrors the JSON directory: documents whose JSON file has
+been removed are dropped on the next import.
+
+CSV and Parquet exports stream rows straight from a cursor, so they never hold
+the whole dataset in memory.
+
+Usage:
+    python result_store.py import                 # add new/changed processed_data/*.json
+    python result_store.py csv [output.csv]       # export combined CSV
+    python result_store.py parquet [output.parquet]
+    python result_store.py query "label = 'H1' AND font_size > 14"
+    python result_store.py query "document = 'file01'"   # any column, plus document
+"""
+import os, sys, json, csv, time, sqlite3
+from pathlib import Path
+
+JSON_DIR = Path(__file__).parent.parent / "processed_data"
+# Keep the database on a local disk, never on the share processed_data may live on
+DB_PATH = Path(os.environ.get("RESULT_STORE_DB", Path.home() / ".extract_api_pdf" / "results.sqlite"))
+CSV_PATH = Path(__file__).parent.parent / "csv_data" / "combined_all_data.csv"
+PARQUET_PATH = Path(__file__).parent.parent / "csv_data" / "combined_all_data.parquet"
+
+EXPORT_BATCH_ROWS = 10000
+BUSY_TIMEOUT = 60  # seconds to wait if another process (e.g. a reader) holds the lock
+
+# Same column order as the *_dataset.json rows and combined_all_data.csv
+COLUMNS = [
+    ("text_content", "TEXT"),
+    ("font_size", "REAL"),
+    ("font_name", "TEXT"),
+    ("is_bold", "INTEGER"),
+    ("is_italic", "INTEGER"),
+    ("is_all_caps", "INTEGER"),
+    ("x_coordinate", "REAL"),
+    ("y_coordinate", "REAL"),
+    ("width", "REAL"),
+    ("height", "REAL"),
+    ("page_number", "INTEGER"),
+    ("line_spacing", "REAL"),
+    ("indentation_level", "INTEGER"),
+    ("ends_with_colon", "INTEGER"),
+    ("contains_numbering_bullets", "INTEGER"),
+    ("is_first_line_on_page", "INTEGER"),
+    ("distance_to_previous_line", "REAL"),
+    ("distance_to_next_line", "REAL"),
+    ("label", "TEXT"),
+    ("heading_score", "INTEGER"),
+    ("source", "TEXT"),  # "adobe" or "outline"; rows written before the column existed are "adobe"
+]
+COLUMN_NAMES = [name for name, _ in COLUMNS]
+COLUMN_DEFAULTS = {"source": "adobe"}
+BOOL_COLUMNS = {name for name in COLUMN_NAMES if name.startswith(("is_", "ends_", "contains_"))}
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    source_mtime REAL,
+    row_count INTEGER NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS headings (
+    document_id INTEGER NOT NULL REFERENCES documents(id) ON DELETE CASCADE,
+    row_index INTEGER NOT NULL,
+    {", ".join(f"{name} {sql_type}" for name, sql_type in COLUMNS)},
+    PRIMARY KEY (document_id, row_index)
+);
+CREATE INDEX IF NOT EXISTS idx_headings_label ON headings(label, font_size);
+CREATE INDEX IF NOT EXISTS idx_headings_page ON headings(page_number);
+CREATE INDEX IF NOT EXISTS idx_headings_score ON headings(heading_score);
+"""
+
+class ResultStore:
+    def __init__(self, db_path=DB_PATH):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        # Autocommit mode; transactions are opened explicitly with BEGIN IMMEDIATE
+        self.conn = sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT, isolation_level=None)
+        # Rollback journal rather than WAL: WAL needs shared memory on one host
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        self.conn.executescript(SCHEMA)
+        # Stores created before a column existed get it added (older rows read as the default)
+        existing = {row[1] for row in self.conn.execute("PRAGMA table_info(headings)")}
+        for name, sql_type in COLUMNS:
+            if name not in existing:
+                self.conn.execute(f"ALTER TABLE headings ADD COLUMN {name} {sql_type}")
+                if name in COLUMN_DEFAULTS:
+                    self.conn.execute(f"UPDATE headings SET {name} = ?", (COLUMN_DEFAULTS[name],))
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def write_documents(self, documents, remove=()):
+        """
+        Replace the rows of several documents in one transaction.
+        documents: iterable of (name, feats) or (name, feats, source_mtime).
+        remove: names of documents to delete (with their rows) in the same transaction.
+        """
+        now = time.time()
+        # IMMEDIATE takes the write lock up front, so a concurrent reader cannot
+        # turn the read->write upgrade into a busy error halfway through
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            for name, feats, *rest in documents:
+                source_mtime = rest[0] if rest else None
+                self.conn.execute(
+                    "INSERT INTO documents (name, source_mtime, row_count, updated) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT(name) DO UPDATE SET source_mtime = excluded.source_mtime, "
+                    "row_count = excluded.row_count, updated = excluded.updated",
+                    (name, source_mtime, len(feats), now))
+                doc_id = self.conn.execute("SELECT id FROM documents WHERE name = ?", (name,)).fetchone()[0]
+                self.conn.execute("DELETE FROM headings WHERE document_id = ?", (doc_id,))
+                self.conn.executemany(
+                    f"INSERT INTO headings (document_id, row_index, {', '.join(COLUMN_NAMES)}) "
+                    f"VALUES (?, ?, {', '.join('?' * len(COLUMN_NAMES))})",
+                    ((doc_id, i, *(feat.get(name, COLUMN_DEFAULTS.get(name)) for name in COLUMN_NAMES)) for i, feat in enumerate(feats)))
+            # Rows go with their document (ON DELETE CASCADE)
+            self.conn.executemany("DELETE FROM documents WHERE name = ?", ((name,) for name in remove))
+            self.conn.execute("COMMIT")
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+
+    def write_document(self, name, feats, source_mtime=None):
+        self.write_documents([(name, feats, source_mtime)])
+
+    def document_mtimes(self):
+        return dict(self.conn.execute("SELECT name, source_mtime FROM documents"))
+
+    def import_json_dir(self, json_dir, batch_documents=20):
+        """
+        Incremental combine: load *_dataset.json files that are new or changed
+        since the last import, and drop documents whose file is gone
+        """
+        known = self.document_mtimes()
+        seen = set()
+        batch, imported, unchanged = [], 0, 0
+        for json_file in sorted(Path(json_dir).glob("*_dataset.json")):
+            name = json_file.stem[:-len("_dataset")]
+            seen.add(name)
+            mtime = json_file.stat().st_mtime
+            if known.get(name) == mtime:
+                unchanged += 1
+                continue
+            with open(json_file, "r", encoding="utf-8") as f:
+                batch.append((name, json.load(f), mtime))
+            if len(batch) >= batch_documents:
+                self.write_documents(batch)
+                imported += len(batch)
+                batch = []
+        removed = sorted(set(known) - seen)
+        if batch or removed:
+            self.write_documents(batch, remove=removed)
+            imported += len(batch)
+        print(f"📥 Imported {imported} new/changed documents, {unchanged} already up to date, {len(removed)} removed")
+        return imported
+
+    def iter_rows(self, where=None, params=(), batch_rows=EXPORT_BATCH_ROWS):
+        """
+        Yield lists of row dicts (with a 'document' key) in document/row order.
+        where may use any column name, including document.
+        """
+        sql = (f"SELECT {', '.join(COLUMN_NAMES)}, document FROM "
+               f"(SELECT {', '.join('h.' + n for n in COLUMN_NAMES)}, h.row_index, d.name AS document "
+               f"FROM headings h JOIN documents d ON d.id = h.document_id)")
+        if where:
+            sql += f" WHERE {where}"
+        sql += " ORDER BY document, row_index"
+        cursor = self.conn.execute(sql, params)
+        while True:
+            chunk = cursor.fetchmany(batch_rows)
+            if not chunk:
+                return
+            rows = []
+            for values in chunk:
+                row = dict(zip(COLUMN_NAMES + ["document"], values))
+                for name in BOOL_COLUMNS:
+                    row[name] = bool(row[name])
+                rows.append(row)
+            yield rows
+
+    def query(self, where=None, params=()):
+        return [row for rows in self.iter_rows(where, params) for row in rows]
+
+    def export_csv(self, csv_path=CSV_PATH, where=None, params=()):
+        """Stream the store into a CSV with the same layout as combine_json_to_csv.py (nulls -> 0)"""
+        csv_path = Path(csv_path)
+        csv_path.parent.mkdir(parents=True, exist_ok=True)
+        count = 0
+        with open(csv_path, "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(COLUMN_NAMES + ["document"])
+            for rows in self.iter_rows(where, params):
+                for row in rows:
+                    writer.writerow([_csv_value(row[name]) for name in COLUMN_NAMES + ["document"]])
+                count += len(rows)
+        print(f"💾 {count} rows → {csv_path}")
+        return count
+
+    def export_parquet(self, parquet_path=PARQUET_PATH, where=None, params=()):
+        """Stream the store into Parquet one record batch at a time (needs pyarrow)"""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        arrow_types = {"TEXT": pa.string(), "REAL": pa.float64(), "INTEGER": pa.int64()}
+        schema = pa.schema([(name, pa.bool_() if name in BOOL_COLUMNS else arrow_types[sql_type])
+                            for name, sql_type in COLUMNS] + [("document", pa.string())])
+
+        parquet_path = Path(parquet_path)
+        parquet_path.parent.mkdir(parents=True, exist_ok=True)
+        count = 0
+        with pq.ParquetWriter(parquet_path, schema) as writer:
+            for rows in self.iter_rows(where, params):
+                writer.write_batch(pa.RecordBatch.from_pylist(rows, schema=schema))
+                count += len(rows)
+        print(f"💾 {count} rows → {parquet_path}")
+        return count
+
+def _csv_value(value):
+    if value is None:
+        return 0
+    if isinstance(value, float):
+        return f"{value:.10g}"
+    return value
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "import"
+    with ResultStore() as store:
+        if command == "import":
+            store.import_json_dir(JSON_DIR)
+        elif command == "csv":
+            store.export_csv(sys.argv[2] if len(sys.argv) > 2 else CSV_PATH)
+        elif command == "parquet":
+            store.export_parquet(sys.argv[2] if len(sys.argv) > 2 else PARQUET_PATH)
+        elif command == "query":
+            rows = store.query(sys.argv[2] if len(sys.argv) > 2 else None)
+            for row in rows[:20]:
+                print(f"  • {row['document']} p{row['page_number']} {row['label']}: '{row['text_content'][:40]}'")
+            print(f"📊 {len(rows)} matching rows")
+        else:
+            print(__doc__)
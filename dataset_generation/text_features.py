@@ -0,0 +1,207 @@
+"""
+Per-line layout features for extracted text elements.
+
+calculate_text_features() turns Adobe structuredData elements (grouped by
+page) into rows with neighbour distances, line spacing, indentation and a
+column_index, reading multi-column pages column by column. Pure Python with
+no SDK dependency, so it can be tested and benchmarked on its own.
+"""
+import bisect
+
+# Column detection (points)
+MIN_COLUMN_GUTTER = 8  # narrower gaps between x-ranges are not a column break
+MIN_COLUMN_LINES = 3  # x-ranges covered by fewer lines than this are gutter, not column
+SPANNING_WIDTH_RATIO = 0.55  # wider than this share of the text width spans columns
+SPANNING = -1  # column_index of elements spanning several columns
+STRAY = -2  # column_index of narrow elements outside every column
+
+def _is_valid_line(elem):
+    text = elem.get("Text", "").strip()
+    return len(text) >= 2 and len(elem.get("Bounds", [])) >= 4
+
+def detect_columns(elements):
+    """Detect text columns on one page from the x-extent of its elements.
+
+    A sweep over the x-ranges of all narrow lines gives, for every x, how many
+    lines cover it. Only stretches covered by at least MIN_COLUMN_LINES lines
+    count as column body, so a stray page or line number in the gutter cannot
+    bridge two columns.
+
+    Returns (columns, column_of): columns is a sorted list of (x_start, x_end)
+    intervals; column_of maps id(elem) -> column index, SPANNING for elements
+    that span several columns (titles, full-width figure captions, footers),
+    or STRAY for narrow elements outside every column (gutter numbers, margin notes).
+    """
+    if not elements:
+        return [], {}
+    
+    page_left = min(e["Bounds"][0] for e in elements)
+    page_right = max(e["Bounds"][2] for e in elements)
+    text_width = max(page_right - page_left, 1)
+    
+    # Full-width lines would bridge every gutter, so leave them out of detection
+    narrow = [e for e in elements if (e["Bounds"][2] - e["Bounds"][0]) <= SPANNING_WIDTH_RATIO * text_width]
+    
+    # x-projection: sorted start/end events, O(n log n)
+    events = sorted([(e["Bounds"][0], 1) for e in narrow] + [(e["Bounds"][2], -1) for e in narrow],
+                    key=lambda ev: (ev[0], -ev[1]))
+    dense = []
+    coverage = 0
+    start = None
+    for x, delta in events:
+        coverage += delta
+        if coverage >= MIN_COLUMN_LINES and start is None:
+            start = x
+        elif coverage < MIN_COLUMN_LINES and start is not None:
+            # Gaps narrower than a gutter (ragged line ends, word spacing) do not split a column
+            if dense and start - dense[-1][1] < MIN_COLUMN_GUTTER:
+                dense[-1][1] = x
+            else:
+                dense.append([start, x])
+            start = None
+    
+    if len(dense) < 2:
+        # Single-column page: everything reads top to bottom as one column
+        return [(page_left, page_right)], {id(e): 0 for e in elements}
+    
+    # Assign each narrow element to the column containing its centre - O(log k) per element;
+    # a centre in a gutter or outside every column makes it a stray
+    starts = [s for s, _ in dense]
+    def locate(elem):
+        x, _, x2, _ = elem["Bounds"][:4]
+        centre = (x + x2) / 2
+        k = bisect.bisect_right(starts, centre) - 1
+        return k if k >= 0 and centre <= dense[k][1] else STRAY
+    
+    narrow_ids = {id(e) for e in narrow}
+    column_of = {id(e): locate(e) if id(e) in narrow_ids else SPANNING for e in elements}
+    return [tuple(d) for d in dense], column_of
+
+def calculate_text_features(elements_by_page):
+    """Calculate advanced text features with column-aware reading order.
+
+    Each page is split into columns (see detect_columns) and the previous/next
+    line of an element is looked up within its own column, so two-column
+    papers no longer interleave lines from both columns. Full-width elements
+    take part in every column; stray elements (gutter numbers, margin notes)
+    take part in none and are measured against the whole page.
+
+    Compared to the original single-column pass (kept in
+    benchmark_reading_order.py for comparison), only valid lines (text of 2+
+    characters with Bounds) count for margins, neighbours and
+    is_first_line_on_page, and the top line of every column takes its
+    line_spacing from the next line.
+    """
+    enhanced_elements = []
+    
+    for page_num, elements in elements_by_page.items():
+        if not elements:
+            continue
+        
+        lines = [elem for elem in elements if _is_valid_line(elem)]
+        if not lines:
+            continue
+        
+        # Top to bottom over the whole page
+        lines.sort(key=lambda e: -e["Bounds"][1])
+        columns, column_of = detect_columns(lines)
+        
+        # Per-column line lists (spanning elements belong to every column), each sorted top to bottom
+        spanning = [e for e in lines if column_of[id(e)] == SPANNING]
+        column_lines = [[] for _ in columns]
+        for elem in lines:
+            col = column_of[id(elem)]
+            if col >= 0:
+                column_lines[col].append(elem)
+        for k in range(len(columns)):
+            column_lines[k] = sorted(column_lines[k] + spanning, key=lambda e: -e["Bounds"][1])
+        
+        # Neighbour distances: previous/next line in the same column
+        prev_distance = {}
+        next_distance = {}
+        for ordered in column_lines:
+            for i, elem in enumerate(ordered):
+                if column_of[id(elem)] == SPANNING:
+                    continue
+                y = elem["Bounds"][1]
+                if i > 0:
+                    prev_distance[id(elem)] = abs(ordered[i-1]["Bounds"][1] - y)
+                if i < len(ordered) - 1:
+                    next_distance[id(elem)] = abs(y - ordered[i+1]["Bounds"][1])
+        # Spanning and stray elements read against the whole page
+        for i, elem in enumerate(lines):
+            if column_of[id(elem)] >= 0:
+                continue
+            y = elem["Bounds"][1]
+            if i > 0:
+                prev_distance[id(elem)] = abs(lines[i-1]["Bounds"][1] - y)
+            if i < len(lines) - 1:
+                next_distance[id(elem)] = abs(y - lines[i+1]["Bounds"][1])
+        
+        # Page-level statistics for indentation
+        left_margin, indentation_unit = _indentation_stats([e["Bounds"][0] for e in lines])
+        column_margins = [_indentation_stats([e["Bounds"][0] for e in ordered if column_of[id(e)] >= 0])
+                          for ordered in column_lines]
+        
+        # Reading order: spanning elements cut the page into bands; within a band
+        # read column by column, top to bottom (strays come after the columns)
+        spanning_ys = sorted(-e["Bounds"][1] for e in spanning)
+        def reading_key(elem):
+            band = bisect.bisect_left(spanning_ys, -elem["Bounds"][1])
+            col = column_of[id(elem)]
+            if col == SPANNING:
+                order = len(columns) + 1
+            elif col == STRAY:
+                order = len(columns)
+            else:
+                order = col
+            return (band, order, -elem["Bounds"][1])
+        
+        for i, elem in enumerate(sorted(lines, key=reading_key)):
+            x, y, x2, y2 = elem["Bounds"][:4]
+            col = column_of[id(elem)]
+            
+            # Indentation relative to the element's own column
+            margin, unit = column_margins[col] if col >= 0 else (left_margin, indentation_unit)
+            try:
+                indentation_level = max(0, round((x - margin) / unit))
+            except (ZeroDivisionError, ValueError):
+                indentation_level = 0
+            
+            prev = prev_distance.get(id(elem))
+            nxt = next_distance.get(id(elem))
+            
+            # Top line of a column has nothing above it - use the gap to the next line
+            line_spacing = prev if prev is not None else (nxt if nxt is not None else 0)
+            
+            # Enhanced element with calculated features
+            enhanced_elem = elem.copy()
+            enhanced_elem.update({
+                'distance_to_previous_line': prev,
+                'distance_to_next_line': nxt,
+                'line_spacing': line_spacing,
+                'indentation_level': indentation_level,
+                'is_first_line_on_page': (i == 0),
+                'column_index': col,
+                'computed_x': x,
+                'computed_y': y,
+                'computed_width': x2 - x,
+                'computed_height': y2 - y,
+                'page_left_margin': margin,  # Additional context
+                'page_indentation_unit': unit  # Additional context
+            })
+            
+            enhanced_elements.append(enhanced_elem)
+    
+    return enhanced_elements
+
+def _indentation_stats(x_coordinates):
+    """Left margin and indentation unit (smallest x step above 5pt) for a set of lines"""
+    if not x_coordinates:
+        return 0, 20
+    
+    sorted_x = sorted(set(x_coordinates))
+    left_margin = sorted_x[0]
+    valid_diffs = [sorted_x[i] - sorted_x[i-1] for i in range(1, len(sorted_x)) if sorted_x[i] - sorted_x[i-1] > 5]
+    indentation_unit = min(valid_diffs) if valid_diffs else 20
+    return left_margin, indentation_unit
@@ -0,0 +1,426 @@
+"""
+Filesystem-backed work queue for processing the PDF corpus with many workers.
+
+Workers on one machine or on several machines sharing a filesystem claim PDFs
+through lease files, keep them alive with heartbeats and commit results
+atomically to the output directory. Leases that stop being renewed (a worker
+crashed or was killed) expire and are reclaimed by the other workers.
+
+Queue layout (inside the output directory):
+
+    .queue/leases/<stem>.lease    held while a worker processes <stem>.pdf
+    .queue/done/<stem>.done       written after <stem>_dataset.json is committed
+    .queue/failed/<stem>.json     last error and attempt count for a PDF that raised
+    .queue/workers/<id>.json      per-worker progress, aggregated by queue_status()
+
+Callers can pass a dict of numeric counters (e.g. fast-path timings); it is
+saved with each worker's progress and summed across workers by queue_status().
+
+The SQLite result store is deliberately not written from here: SQLite's
+locking is unreliable on shared network filesystems. Run
+`python result_store.py import` in one process to load committed results.
+
+A PDF that raises is retried (after RETRY_DELAY) until it has failed
+MAX_ATTEMPTS times; only then is it skipped for good.
+
+Everything relies only on exclusive create, rename and mtime. Exclusive
+create uses a hard link to a fully written temp file, so readers never see a
+half-written lease; where hard links are unsupported (many SMB/CIFS mounts,
+FAT/exFAT volumes) it falls back to os.open(O_CREAT | O_EXCL), which local
+disks and NFSv3+ honour atomically but which SMB honours only if the server
+does.
+
+Usage:
+    python work_queue.py                    # aggregated progress
+    python work_queue.py --simulate 4       # local crash test with 4 workers
+"""
+import os, sys, json, time, uuid, random, socket, shutil, tempfile, threading
+from pathlib import Path
+
+LEASE_TIMEOUT = 120  # seconds without a heartbeat before a lease can be reclaimed
+HEARTBEAT_INTERVAL = 10  # seconds between lease renewals
+IDLE_POLL_INTERVAL = 5  # seconds to wait when every remaining PDF is leased
+MAX_ATTEMPTS = 3  # failed attempts before a PDF is given up on
+RETRY_DELAY = 60  # seconds before a failed PDF may be claimed again
+
+def _write_atomic(path: Path, payload: str):
+    """Write via a temp file in the same directory and rename over the target"""
+    tmp = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+def _create_exclusive(path: Path, payload: str) -> bool:
+    """Create path with its full contents; False if it already exists"""
+    tmp = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+    tmp.write_text(payload, encoding="utf-8")
+    try:
+        # link() fails if the target exists, and readers never see a half-written owner id
+        os.link(tmp, path)
+        return True
+    except FileExistsError:
+        return False
+    except OSError:
+        pass  # no hard links here (EPERM/ENOTSUP on SMB, FAT, ...)
+    finally:
+        os.unlink(tmp)
+
+    # O_EXCL create; until the write lands, readers may briefly see an empty file,
+    # which Lease.renew() rightly treats as someone else's lease
+    try:
+        fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+    except FileExistsError:
+        return False
+    try:
+        os.write(fd, payload.encode("utf-8"))
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+    return True
+
+class Lease:
+    """A claimed PDF, renewed by a heartbeat thread until released"""
+
+    def __init__(self, queue, pdf: Path, path: Path):
+        self.queue = queue
+        self.pdf = pdf
+        self.path = path
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._heartbeat, daemon=True)
+        self._thread.start()
+
+    def _heartbeat(self):
+        while not self._stop.wait(self.queue.heartbeat_interval):
+            if not self.renew():
+                return
+
+    def _owner(self):
+        try:
+            return self.path.read_text(encoding="utf-8")
+        except FileNotFoundError:
+            return None
+
+    def renew(self):
+        """Touch the lease; returns False (and marks it lost) only if another worker now owns it"""
+        owner = self._owner()
+        if owner is None:
+            # A missing lease is not proof of loss: another worker may be between the
+            # rename and the link-back in _reclaim_if_expired. Take it back if it is
+            # still free; exclusive create means at most one worker can.
+            if _create_exclusive(self.path, self.queue.worker_id):
+                return True
+            owner = self._owner()
+        if owner is not None and owner != self.queue.worker_id:
+            self.lost = True
+            return False
+        try:
+            os.utime(self.path)
+        except FileNotFoundError:
+            pass  # moved again mid-reclaim; the next renewal settles it
+        return True
+
+    def release(self):
+        self._stop.set()
+        self._thread.join()
+        if not self.lost:
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+
+class WorkQueue:
+    def __init__(self, pdf_dir, out_dir, worker_id=None,
+                 lease_timeout=LEASE_TIMEOUT, heartbeat_interval=HEARTBEAT_INTERVAL,
+                 poll_interval=IDLE_POLL_INTERVAL, retry_delay=RETRY_DELAY, counters=None):
+        self.pdf_dir = Path(pdf_dir)
+        self.out_dir = Path(out_dir)
+        self.root = self.out_dir / ".queue"
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.lease_timeout = lease_timeout
+        self.heartbeat_interval = heartbeat_interval
+        self.poll_interval = poll_interval
+        self.retry_delay = retry_delay
+        self.counters = counters if counters is not None else {}
+        self._done = set()  # stems known to be finished; never stat'ed again
+
+        for sub in ("leases", "done", "failed", "workers"):
+            (self.root / sub).mkdir(parents=True, exist_ok=True)
+
+        self.stats = {
+            "worker": self.worker_id,
+            "host": socket.gethostname(),
+            "pid": os.getpid(),
+            "started": time.time(),
+            "updated": time.time(),
+            "processed": 0,
+            "failed": 0,
+            "features": 0,
+            "busy_seconds": 0.0,
+        }
+        self._save_stats()
+
+    def output_path(self, pdf: Path) -> Path:
+        return self.out_dir / f"{pdf.stem}_dataset.json"
+
+    def _marker(self, kind, pdf: Path, suffix):
+        return self.root / kind / f"{pdf.stem}{suffix}"
+
+    def failure(self, pdf: Path):
+        """The failure record of a PDF ({"attempts", "error", ...}) or None"""
+        try:
+            return json.loads(self._marker("failed", pdf, ".json").read_text(encoding="utf-8"))
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def is_done(self, pdf: Path) -> bool:
+        if self._marker("done", pdf, ".done").exists():
+            return True
+        failure = self.failure(pdf)
+        return failure is not None and failure["attempts"] >= MAX_ATTEMPTS
+
+    def _reclaim_if_expired(self, lease_path: Path):
+        """Move an expired lease out of the way; only one worker wins the rename"""
+        try:
+            if time.time() - lease_path.stat().st_mtime < self.lease_timeout:
+                return
+            tombstone = lease_path.with_name(f"{lease_path.name}.expired.{uuid.uuid4().hex}")
+            os.rename(lease_path, tombstone)
+        except FileNotFoundError:
+            return
+
+        # Between our stat() and rename() another worker may have reclaimed it and
+        # created a fresh lease; if so, put that one back (unless a lease exists again)
+        if time.time() - tombstone.stat().st_mtime < self.lease_timeout:
+            _create_exclusive(lease_path, tombstone.read_text(encoding="utf-8"))
+        else:
+            print(f"  ♻️  Reclaimed expired lease: {lease_path.stem}")
+        os.unlink(tombstone)
+
+    def claim(self, pdf: Path):
+        """Try to lease one PDF; returns a Lease or None"""
+        lease_path = self._marker("leases", pdf, ".lease")
+        self._reclaim_if_expired(lease_path)
+        if not _create_exclusive(lease_path, self.worker_id):
+            return None
+
+        # A worker may have committed it between our listing and our claim
+        if self.is_done(pdf):
+            os.unlink(lease_path)
+            return None
+        return Lease(self, pdf, lease_path)
+
+    def next_lease(self):
+        """Claim the next unfinished PDF; returns (lease, pending) where pending counts PDFs still open"""
+        pdfs = sorted(p for p in self.pdf_dir.glob("*.pdf") if p.stem not in self._done)
+        # Start at a random point so workers do not all contend for the head of the list
+        offset = random.randrange(len(pdfs)) if pdfs else 0
+        pending = 0
+        for pdf in pdfs[offset:] + pdfs[:offset]:
+            if self.is_done(pdf):
+                self._done.add(pdf.stem)
+                continue
+            pending += 1
+            failure = self.failure(pdf)
+            if failure is not None and time.time() - failure["time"] < self.retry_delay:
+                continue  # failed recently; give a transient error time to clear
+            lease = self.claim(pdf)
+            if lease:
+                return lease, pending
+        return None, pending
+
+    def commit(self, lease: Lease, feats) -> bool:
+        """Atomically publish the result for a leased PDF, unless the lease was lost"""
+        if not lease.renew():
+            print(f"  ⚠️  Lease lost for {lease.pdf.name}, discarding result")
+            return False
+        _write_atomic(self.output_path(lease.pdf), json.dumps(feats, indent=2, ensure_ascii=False))
+        _write_atomic(self._marker("done", lease.pdf, ".done"), self.worker_id)
+        self._marker("failed", lease.pdf, ".json").unlink(missing_ok=True)
+        self._done.add(lease.pdf.stem)
+        return True
+
+    def fail(self, lease: Lease, error):
+        """Record a failed attempt; the PDF stays claimable until MAX_ATTEMPTS is reached"""
+        if lease.renew():
+            previous = self.failure(lease.pdf)
+            attempts = (previous["attempts"] if previous else 0) + 1
+            _write_atomic(self._marker("failed", lease.pdf, ".json"),
+                          json.dumps({"worker": self.worker_id, "error": str(error),
+                                      "time": time.time(), "attempts": attempts}))
+            if attempts < MAX_ATTEMPTS:
+                print(f"  🔁 Attempt {attempts}/{MAX_ATTEMPTS} failed, will retry in {self.retry_delay}s")
+
+    def _save_stats(self):
+        self.stats["updated"] = time.time()
+        self.stats["counters"] = dict(self.counters)
+        _write_atomic(self.root / "workers" / f"{self.worker_id}.json", json.dumps(self.stats))
+
+    def run(self, process_pdf, max_idle_polls=None):
+        """
+        Process PDFs until none are left. process_pdf(pdf_path) returns the
+        feature rows for one PDF. When every open PDF is leased by someone else
+        the worker keeps polling, so it can pick up leases of crashed workers.
+        """
+        print(f"👷 Worker {self.worker_id} started")
+        idle_polls = 0
+
+        while True:
+            lease, pending = self.next_lease()
+            if lease is None:
+                if pending == 0 or (max_idle_polls is not None and idle_polls >= max_idle_polls):
+                    break
+                idle_polls += 1
+                time.sleep(self.poll_interval)
+                continue
+            idle_polls = 0
+
+            print(f"\n📄 [{self.worker_id}] Processing {lease.pdf.name}")
+            start = time.time()
+            try:
+                feats = process_pdf(lease.pdf)
+                if self.commit(lease, feats):
+                    self.stats["processed"] += 1
+                    self.stats["features"] += len(feats)
+                    print(f"  ✅ {len(feats)} heading/title rows → {self.output_path(lease.pdf).name}")
+            except Exception as e:
+                print(f"  ❌ Error: {e}")
+                self.fail(lease, e)
+                self.stats["failed"] += 1
+            finally:
+                lease.release()
+                self.stats["busy_seconds"] += time.time() - start
+                self._save_stats()
+
+        print(f"🏁 Worker {self.worker_id} finished: {self.stats['processed']} processed, {self.stats['failed']} failed")
+        return self.stats
+
+def queue_status(pdf_dir, out_dir, lease_timeout=LEASE_TIMEOUT):
+    """Aggregate progress and throughput across all workers that ever touched the queue"""
+    root = Path(out_dir) / ".queue"
+    pdfs = [p.stem for p in Path(pdf_dir).glob("*.pdf")]
+    done = {p.stem for p in (root / "done").glob("*.done")}
+    failed, retrying = set(), set()
+    for path in (root / "failed").glob("*.json"):
+        try:
+            attempts = json.loads(path.read_text(encoding="utf-8"))["attempts"]
+        except (FileNotFoundError, json.JSONDecodeError):
+            continue
+        (failed if attempts >= MAX_ATTEMPTS else retrying).add(path.stem)
+
+    now = time.time()
+    active_leases, expired_leases = 0, 0
+    for lease in (root / "leases").glob("*.lease"):
+        try:
+            fresh = now - lease.stat().st_mtime < lease_timeout
+        except FileNotFoundError:
+            continue
+        active_leases += fresh
+        expired_leases += not fresh
+
+    workers = []
+    for path in (root / "workers").glob("*.json"):
+        try:
+            workers.append(json.loads(path.read_text(encoding="utf-8")))
+        except (FileNotFoundError, json.JSONDecodeError):
+            continue
+
+    processed = sum(w["processed"] for w in workers)
+    counters = {}
+    for w in workers:
+        for key, value in w.get("counters", {}).items():
+            counters[key] = counters.get(key, 0) + value
+    elapsed = (max(w["updated"] for w in workers) - min(w["started"] for w in workers)) if workers else 0
+    return {
+        "total": len(pdfs),
+        "done": len(done & set(pdfs)),
+        "failed": len(failed & set(pdfs)),
+        "pending": len(set(pdfs) - done - failed),
+        "retrying": len((retrying & set(pdfs)) - done),
+        "active_leases": active_leases,
+        "expired_leases": expired_leases,
+        "workers": len(workers),
+        "live_workers": sum(1 for w in workers if now - w["updated"] < lease_timeout),
+        "processed": processed,
+        "features": sum(w["features"] for w in workers),
+        "docs_per_minute": processed / elapsed * 60 if elapsed > 0 else 0.0,
+        "counters": counters,
+    }
+
+def print_status(pdf_dir, out_dir, lease_timeout=LEASE_TIMEOUT):
+    s = queue_status(pdf_dir, out_dir, lease_timeout)
+    print(f"📊 Queue: {s['done']}/{s['total']} done, {s['failed']} failed, "
+          f"{s['pending']} pending ({s['retrying']} awaiting retry)")
+    print(f"🔒 Leases: {s['active_leases']} active, {s['expired_leases']} expired")
+    print(f"👷 Workers: {s['live_workers']} live / {s['workers']} total, "
+          f"{s['features']} features, {s['docs_per_minute']:.1f} docs/min")
+    return s
+
+def _simulated_process(pdf: Path):
+    """Stand-in for the Adobe round trip: slow, deterministic output"""
+    time.sleep(0.3)
+    return [{"text_content": pdf.stem, "label": "title", "page_number": 1}]
+
+SIMULATED_LEASE_TIMEOUT = 2
+
+def _simulated_worker(pdf_dir, out_dir):
+    WorkQueue(pdf_dir, out_dir, lease_timeout=SIMULATED_LEASE_TIMEOUT, heartbeat_interval=0.2,
+              poll_interval=0.2).run(_simulated_process)
+
+def simulate(n_workers=4, n_pdfs=40, kill=2):
+    """
+    Local crash test: start n_workers processes on a temporary corpus, SIGKILL
+    `kill` of them mid-run, and check every PDF is committed exactly once.
+    """
+    import multiprocessing
+
+    tmp = Path(tempfile.mkdtemp(prefix="work_queue_"))
+    pdf_dir, out_dir = tmp / "raw_pdfs", tmp / "processed_data"
+    pdf_dir.mkdir()
+    out_dir.mkdir()
+    for i in range(n_pdfs):
+        (pdf_dir / f"doc{i:03d}.pdf").write_bytes(b"%PDF-1.4\n")
+
+    print(f"🧪 Simulating {n_workers} workers on {n_pdfs} PDFs in {tmp}")
+    procs = [multiprocessing.Process(target=_simulated_worker, args=(pdf_dir, out_dir)) for _ in range(n_workers)]
+    for p in procs:
+        p.start()
+
+    time.sleep(1.5)
+    for p in procs[:kill]:
+        p.kill()
+        print(f"💥 Killed worker pid {p.pid}")
+    for p in procs:
+        p.join()
+
+    from result_store import ResultStore
+    status = print_status(pdf_dir, out_dir, SIMULATED_LEASE_TIMEOUT)
+    outputs = sorted(out_dir.glob("*_dataset.json"))
+    # Single-process import of the committed JSON, as in production
+    with ResultStore(out_dir / "results.sqlite") as store:
+        store.import_json_dir(out_dir)
+        stored = store.query()
+    # Judge by what is on disk: a worker killed between commit() and _save_stats()
+    # leaves the summed "processed" count short, so it can only flag double commits
+    done = sorted(p.stem for p in (out_dir / ".queue" / "done").glob("*.done"))
+    print(f"🔢 Commits across workers: {status['processed']} (stats) for {n_pdfs} PDFs, {len(done)} done markers")
+    ok = (done == [p.stem for p in sorted(pdf_dir.glob("*.pdf"))] and status["processed"] <= n_pdfs
+          and [o.stem for o in outputs] == [f"{stem}_dataset" for stem in done]
+          and sorted(row["document"] for row in stored) == [p.stem for p in sorted(pdf_dir.glob("*.pdf"))]
+          and not list(out_dir.glob(".*.tmp"))
+          and all(json.loads(o.read_text())[0]["text_content"] + "_dataset" == o.stem for o in outputs))
+    print("✅ All PDFs committed exactly once" if ok else "❌ Queue simulation failed")
+    if ok:
+        shutil.rmtree(tmp)
+    return ok
+
+if __name__ == "__main__":
+    if "--simulate" in sys.argv:
+        idx = sys.argv.index("--simulate")
+        n = int(sys.argv[idx + 1]) if len(sys.argv) > idx + 1 else 4
+        sys.exit(0 if simulate(n_workers=n, kill=max(1, n // 2)) else 1)
+
+    from extract_headings_dataset import RAW_PDFS, OUT_DIR
+    print_status(RAW_PDFS, OUT_DIR)
@@ -0,0 +1,86 @@
+import csv
+import sys
+from pathlib import Path
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "training"))
+import feature_engineering as fe
+
+
+def _write_csv(path, labels, sources=None, pages=None):
+    columns = ['text_content', 'page_number', 'label'] + fe.FLOAT_COLUMNS[1:] + ['font_size', 'source']
+    sources = sources or ['adobe'] * len(labels)
+    pages = pages or [1 + i % 3 for i in range(len(labels))]
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=columns, restval=0)
+        writer.writeheader()
+        for i, (label, source, page) in enumerate(zip(labels, sources, pages)):
+            writer.writerow({'text_content': f"row {i}", 'page_number': page, 'label': label,
+                             'font_size': 12, 'source': source})
+
+
+@pytest.fixture
+def balanced_store(tmp_path):
+    labels = [fe.LABELS[i % len(fe.LABELS)] for i in range(600)]
+    _write_csv(tmp_path / "data.csv", labels)
+    fe.compile_feature_store(tmp_path / "data.csv", tmp_path / "store")
+    return fe.FeatureStore(tmp_path / "store")
+
+
+@pytest.mark.parametrize("batch_size, shuffle_buffer", [(256, 8192), (256, 256), (7, 50), (1000, 64)])
+def test_epoch_yields_every_row_once(balanced_store, batch_size, shuffle_buffer):
+    seen = []
+    for batch in fe.iter_batches(balanced_store, batch_size=batch_size, shuffle_buffer=shuffle_buffer,
+                                 block_size=100, seed=0):
+        assert 0 < len(batch['row']) <= batch_size
+        seen.extend(batch['row'].tolist())
+    assert sorted(seen) == list(range(len(balanced_store)))
+
+
+def test_stratified_batches_follow_label_shares(balanced_store):
+    batches = list(fe.iter_batches(balanced_store, batch_size=60, shuffle_buffer=600, seed=1))
+    counts = np.bincount(batches[0]['label'], minlength=len(fe.LABELS))
+    assert counts.tolist() == [10] * len(fe.LABELS)
+
+
+def test_rare_labels_are_spread_across_the_epoch(tmp_path):
+    # 1% titles: share * batch_size < 1, so titles must still turn up early, not pile up at the end
+    labels = ['title' if i % 100 == 0 else ('H1' if i % 10 == 0 else 'para') for i in range(10000)]
+    _write_csv(tmp_path / "data.csv", labels)
+    fe.compile_feature_store(tmp_path / "data.csv", tmp_path / "store")
+    store = fe.FeatureStore(tmp_path / "store")
+
+    titles = [int(np.sum(batch['label'] == 0))
+              for batch in fe.iter_batches(store, batch_size=64, shuffle_buffer=1024, seed=0)]
+    first_half = sum(titles[:len(titles) // 2])
+    assert sum(titles) == 100
+    assert 35 <= first_half <= 65
+    assert max(titles) <= 2
+
+
+def test_train_val_split_keeps_documents_apart(balanced_store):
+    train_rows, val_rows = fe.train_val_split(balanced_store, val_fraction=0.3, seed=0)
+    documents = np.asarray(balanced_store.columns['document'])
+    assert len(train_rows) + len(val_rows) == len(balanced_store)
+    assert not set(documents[train_rows]) & set(documents[val_rows])
+
+
+def test_outline_rows_are_excluded(tmp_path):
+    _write_csv(tmp_path / "data.csv", ['title', 'H1', 'H2', 'para'], ['adobe', 'outline', 'outline', 0])
+    meta = fe.compile_feature_store(tmp_path / "data.csv", tmp_path / "store")
+    store = fe.FeatureStore(tmp_path / "store")
+    assert meta["excluded_rows"] == 2
+    assert [store.text(i) for i in range(len(store))] == ["row 0", "row 3"]
+
+
+def test_wrapped_title_rows_stay_in_one_document(tmp_path):
+    # No document column: boundaries come from titles that follow a non-title row
+    # (or a page reset; a running header before the title stays with it)
+    _write_csv(tmp_path / "data.csv", ['title', 'title', 'para', 'title', 'title', 'H1', 'para', 'para', 'title'],
+               pages=[1, 1, 1, 1, 1, 1, 2, 1, 1])
+    fe.compile_feature_store(tmp_path / "data.csv", tmp_path / "store")
+    store = fe.FeatureStore(tmp_path / "store")
+    assert np.asarray(store.columns['document']).tolist() == [0, 0, 0, 1, 1, 1, 1, 2, 2]
@@ -0,0 +1,54 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "dataset_generation"))
+import text_features as tf
+
+
+def two_column_page(extra=()):
+    elements = []
+    for i in range(20):
+        elements.append({"Text": f"left line {i}", "Bounds": [54, 700 - 12 * i, 294, 708 - 12 * i]})
+        elements.append({"Text": f"right line {i}", "Bounds": [315, 695 - 12 * i, 555, 703 - 12 * i]})
+    elements.extend(extra)
+    return elements
+
+
+def by_text(rows):
+    return {row["Text"]: row for row in rows}
+
+
+def test_neighbours_stay_within_column():
+    rows = by_text(tf.calculate_text_features({0: two_column_page()}))
+    assert rows["left line 5"]["distance_to_previous_line"] == 12
+    assert rows["right line 5"]["distance_to_previous_line"] == 12
+    assert rows["left line 5"]["column_index"] == 0
+    assert rows["right line 5"]["column_index"] == 1
+
+
+def test_gutter_number_does_not_merge_columns():
+    stray = {"Text": "12", "Bounds": [300, 500, 310, 508]}
+    note = {"Text": "margin note", "Bounds": [560, 600, 600, 608]}
+    page = two_column_page([stray, note])
+
+    columns, _ = tf.detect_columns(page)
+    assert len(columns) == 2
+
+    rows = by_text(tf.calculate_text_features({0: page}))
+    assert rows["12"]["column_index"] == tf.STRAY
+    assert rows["margin note"]["column_index"] == tf.STRAY
+    assert all(row["distance_to_previous_line"] == 12
+               for text, row in rows.items() if "line" in text and not text.endswith(" 0"))
+
+
+def test_line_without_bounds_is_skipped():
+    rows = tf.calculate_text_features({0: two_column_page([{"Text": "no bounds"}])})
+    assert "no bounds" not in by_text(rows)
+
+
+def test_spanning_title_joins_every_column():
+    title = {"Text": "A Two Column Paper", "Bounds": [54, 740, 555, 758]}
+    rows = by_text(tf.calculate_text_features({0: two_column_page([title])}))
+    assert rows["A Two Column Paper"]["column_index"] == tf.SPANNING
+    assert rows["left line 0"]["distance_to_previous_line"] == 40
+    assert rows["right line 0"]["distance_to_previous_line"] == 45
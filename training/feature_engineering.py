@@ -1,2 +1,366 @@
 # feature_engineering.py
 # Feature engineering for training data
+#
+# Compiles csv_data/combined_all_data.csv once into a directory of fixed-width
+# NumPy memmap columns so training never has to parse the CSV again:
+#
+#   feature_store/
+#     meta.json            row count, column dtypes, label + font vocabularies
+#     <column>.bin         one raw little-endian array per column
+#     text_blob.bin        utf-8 bytes of every text_content, back to back
+#     text_offsets.bin     int64 offsets into text_blob.bin (rows + 1 entries)
+#
+# Batches are drawn through a shuffle buffer fed by contiguous blocks of rows,
+# so reads stay sequential on disk while batches are still well mixed.
+
+import csv
+import json
+import hashlib
+from pathlib import Path
+from collections import defaultdict
+
+import numpy as np
+
+# Configuration
+COMBINED_CSV = Path(__file__).parent.parent / "csv_data" / "combined_all_data.csv"
+STORE_DIR = Path(__file__).parent.parent / "feature_store"
+
+LABELS = ["title", "H1", "H2", "H3", "H4", "para"]
+
+FLOAT_COLUMNS = ['font_size', 'x_coordinate', 'y_coordinate', 'width', 'height',
+                 'line_spacing', 'distance_to_previous_line', 'distance_to_next_line']
+INT_COLUMNS = ['page_number', 'indentation_level', 'heading_score']
+BOOL_COLUMNS = ['is_bold', 'is_italic', 'is_all_caps', 'ends_with_colon',
+                'contains_numbering_bullets', 'is_first_line_on_page']
+
+# Order of columns in the matrix returned by FeatureStore.features()
+FEATURE_COLUMNS = FLOAT_COLUMNS + INT_COLUMNS + BOOL_COLUMNS
+
+COLUMN_DTYPES = {col: '<f4' for col in FLOAT_COLUMNS}
+COLUMN_DTYPES.update({col: '<i4' for col in INT_COLUMNS})
+COLUMN_DTYPES.update({col: '|u1' for col in BOOL_COLUMNS})
+COLUMN_DTYPES.update({
+    'label': '|i1',        # index into LABELS, -1 for unknown labels
+    'document': '<i4',     # document id, used for train/validation splits
+    'font_id': '<i4',      # index into the font vocabulary in meta.json
+    'text_hash': '<u8',    # stable 64-bit hash of text_content
+})
+
+WRITE_CHUNK_ROWS = 65536
+
+# Outline fast-path rows have no typographic features (the combine step fills them with 0)
+EXCLUDED_SOURCES = ('outline',)
+
+
+def hash_text(text):
+    """Stable 64-bit hash of a string (Python's hash() is salted per process)"""
+    return int.from_bytes(hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _to_int(value):
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return 0
+
+
+def _to_bool(value):
+    return str(value).strip().lower() in ('true', '1', '1.0', 'yes')
+
+
+def compile_feature_store(csv_path=COMBINED_CSV, store_dir=STORE_DIR, exclude_sources=EXCLUDED_SOURCES):
+    """
+    Stream the combined CSV into memmap columns, WRITE_CHUNK_ROWS rows at a time.
+    Documents come from a 'document' column when present; otherwise the combined
+    CSV is assumed to be written one document after another, and a new document
+    starts whenever page_number goes backwards, or a title row follows a
+    non-title row in a document that already has its title (a title can wrap
+    onto several consecutive rows, and a running header can precede it).
+    Rows whose 'source' is in exclude_sources are skipped.
+    """
+    csv_path = Path(csv_path)
+    store_dir = Path(store_dir)
+    store_dir.mkdir(parents=True, exist_ok=True)
+
+    print(f"🔄 Compiling feature store from {csv_path.name}...")
+
+    files = {col: open(store_dir / f"{col}.bin", 'wb') for col in COLUMN_DTYPES}
+    blob = open(store_dir / "text_blob.bin", 'wb')
+    offsets = open(store_dir / "text_offsets.bin", 'wb')
+
+    font_vocab = {}
+    document_names = {}
+    label_counts = defaultdict(int)
+    chunk = defaultdict(list)
+    blob_offset = 0
+    text_offsets = [0]
+    rows = 0
+    document = -1
+    prev_page = None
+    prev_label = None
+    has_title = False
+    skipped = 0
+    skipped_documents = set()
+
+    def flush():
+        for col, dtype in COLUMN_DTYPES.items():
+            np.asarray(chunk[col], dtype=dtype).tofile(files[col])
+        np.asarray(text_offsets[1:], dtype='<i8').tofile(offsets)
+        chunk.clear()
+        del text_offsets[:-1]
+
+    try:
+        np.asarray([0], dtype='<i8').tofile(offsets)
+
+        with open(csv_path, 'r', encoding='utf-8', newline='') as f:
+            for record in csv.DictReader(f):
+                if record.get('source') in exclude_sources:
+                    skipped += 1
+                    skipped_documents.add(record.get('document'))
+                    continue
+                page = _to_int(record.get('page_number'))
+                label = record.get('label', '')
+                if 'document' in record:
+                    name = record['document']
+                    if name not in document_names:
+                        document_names[name] = len(document_names)
+                    document = document_names[name]
+                elif (prev_page is None or page < prev_page
+                      or (label == 'title' and prev_label != 'title' and has_title)):
+                    document += 1
+                    document_names[f"document_{document}"] = document
+                    has_title = False
+                prev_page = page
+                prev_label = label
+                has_title = has_title or label == 'title'
+
+                for col in FLOAT_COLUMNS:
+                    chunk[col].append(_to_float(record.get(col)))
+                for col in INT_COLUMNS:
+                    chunk[col].append(_to_int(record.get(col)))
+                for col in BOOL_COLUMNS:
+                    chunk[col].append(_to_bool(record.get(col)))
+
+                label_counts[label] += 1
+                chunk['label'].append(LABELS.index(label) if label in LABELS else -1)
+                chunk['document'].append(document)
+                chunk['font_id'].append(font_vocab.setdefault(record.get('font_name', ''), len(font_vocab)))
+
+                text = record.get('text_content', '')
+                chunk['text_hash'].append(hash_text(text))
+                encoded = text.encode('utf-8')
+                blob.write(encoded)
+                blob_offset += len(encoded)
+                text_offsets.append(blob_offset)
+
+                rows += 1
+                if rows % WRITE_CHUNK_ROWS == 0:
+                    flush()
+
+        flush()
+    finally:
+        for handle in files.values():
+            handle.close()
+        blob.close()
+        offsets.close()
+
+    meta = {
+        "rows": rows,
+        "columns": COLUMN_DTYPES,
+        "feature_columns": FEATURE_COLUMNS,
+        "labels": LABELS,
+        "label_counts": dict(label_counts),
+        "fonts": sorted(font_vocab, key=font_vocab.get),
+        "documents": sorted(document_names, key=document_names.get),
+        "source": str(csv_path),
+        "excluded_sources": list(exclude_sources),
+        "excluded_rows": skipped,
+        "excluded_documents": len(skipped_documents - {None}),
+    }
+    with open(store_dir / "meta.json", 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2, ensure_ascii=False)
+
+    print(f"✅ {rows} rows, {len(document_names)} documents → {store_dir}")
+    print(f"📊 Labels: {dict(label_counts)}")
+    if skipped:
+        documents = len(skipped_documents - {None})
+        print(f"⚠️  Skipped {skipped} rows from sources {list(exclude_sources)}"
+              + (f" ({documents} documents left out of training)" if documents else ""))
+    return meta
+
+
+class FeatureStore:
+    """Read-only view over a compiled feature store directory"""
+
+    def __init__(self, store_dir=STORE_DIR):
+        self.store_dir = Path(store_dir)
+        with open(self.store_dir / "meta.json", 'r', encoding='utf-8') as f:
+            self.meta = json.load(f)
+        self.rows = self.meta["rows"]
+        self.labels = self.meta["labels"]
+        self.fonts = self.meta["fonts"]
+        self.documents = self.meta["documents"]
+
+        self.columns = {}
+        for col, dtype in self.meta["columns"].items():
+            self.columns[col] = self._open(f"{col}.bin", dtype, self.rows)
+        self.text_offsets = self._open("text_offsets.bin", '<i8', self.rows + 1)
+        self.text_blob = self._open("text_blob.bin", '|u1', int(self.text_offsets[-1]) if self.rows else 0)
+
+    def _open(self, name, dtype, length):
+        # np.memmap refuses zero-length files, so an empty store gets empty arrays
+        if length == 0:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(self.store_dir / name, dtype=dtype, mode='r', shape=(length,))
+
+    def __len__(self):
+        return self.rows
+
+    def features(self, rows):
+        """float32 matrix (len(rows) x len(FEATURE_COLUMNS)) for the given row ids"""
+        rows = np.asarray(rows, dtype=np.int64)
+        out = np.empty((len(rows), len(self.meta["feature_columns"])), dtype=np.float32)
+        for j, col in enumerate(self.meta["feature_columns"]):
+            out[:, j] = self.columns[col][rows]
+        return out
+
+    def text(self, row):
+        """Original text_content of one row, read back from the offset table"""
+        start, end = int(self.text_offsets[row]), int(self.text_offsets[row + 1])
+        return bytes(self.text_blob[start:end]).decode('utf-8')
+
+    def batch(self, rows):
+        """Gather one batch; rows are read in sorted order, returned in the given order"""
+        rows = np.asarray(rows, dtype=np.int64)
+        order = np.argsort(rows, kind='stable')
+        sorted_rows = rows[order]
+        inverse = np.empty_like(order)
+        inverse[order] = np.arange(len(order))
+
+        batch = {
+            'row': rows,
+            'features': self.features(sorted_rows)[inverse],
+        }
+        for col in ('label', 'document', 'font_id', 'text_hash'):
+            batch[col] = np.asarray(self.columns[col][sorted_rows])[inverse]
+        return batch
+
+
+def train_val_split(store, val_fraction=0.2, seed=42):
+    """
+    Split rows by document so no document appears in both sets.
+    Documents are shuffled and moved to validation until val_fraction of the rows is reached.
+    """
+    documents = np.asarray(store.columns['document'])
+    doc_ids, doc_sizes = np.unique(documents, return_counts=True)
+
+    rng = np.random.default_rng(seed)
+    order = rng.permutation(len(doc_ids))
+
+    target = val_fraction * len(documents)
+    val_docs = []
+    val_rows = 0
+    for k in order:
+        if val_rows >= target:
+            break
+        # Always leave at least one document for training
+        if len(val_docs) == len(doc_ids) - 1:
+            break
+        val_docs.append(doc_ids[k])
+        val_rows += doc_sizes[k]
+
+    is_val = np.isin(documents, val_docs)
+    return np.flatnonzero(~is_val), np.flatnonzero(is_val)
+
+
+def iter_batches(store, rows=None, batch_size=256, shuffle_buffer=8192,
+                 block_size=1024, stratify=True, seed=None, drop_last=False):
+    """
+    Yield batches (dicts from FeatureStore.batch) for one epoch over rows.
+
+    Rows are consumed in contiguous blocks of block_size (visited in random
+    order) and mixed through a buffer of shuffle_buffer rows. With stratify,
+    each batch takes rows from every label in proportion to its share of the
+    buffer, which tracks its share of the requested rows; rare labels are
+    spread over the epoch instead of piling up at the end.
+    """
+    rng = np.random.default_rng(seed)
+    rows = np.arange(len(store), dtype=np.int64) if rows is None else np.sort(np.asarray(rows, dtype=np.int64))
+    if len(rows) == 0:
+        return
+
+    labels = np.asarray(store.columns['label'])[rows] if stratify else np.zeros(len(rows), dtype=np.int8)
+    pools = {cls: [] for cls in np.unique(labels).tolist()}
+    buffered = 0
+    shuffle_buffer = max(shuffle_buffer, batch_size)
+
+    def take(pool, n):
+        # Swap-remove random entries: O(1) per row regardless of pool size
+        picked = []
+        for _ in range(min(n, len(pool))):
+            k = rng.integers(len(pool))
+            pool[k], pool[-1] = pool[-1], pool[k]
+            picked.append(pool.pop())
+        return picked
+
+    def draw(n):
+        # Each label gets n * (its share of the buffer) rows; the fractional parts are
+        # rounded by systematic sampling, so a label with share * n < 1 still gets a
+        # slot with probability share * n and every buffered row is equally likely
+        sizes = np.array([len(pools[cls]) for cls in pools], dtype=np.float64)
+        total = sizes.sum()
+        if total <= n:
+            return [row for cls in pools for row in take(pools[cls], len(pools[cls]))]
+        exact = n * sizes / total
+        quotas = np.floor(exact).astype(np.int64)
+        remainders = exact - quotas
+        leftover = n - int(quotas.sum())
+        if leftover > 0:
+            order = rng.permutation(len(quotas))
+            points = rng.random() + np.arange(leftover)
+            hits = np.searchsorted(np.cumsum(remainders[order]), points, side='right')
+            quotas[order[np.minimum(hits, len(order) - 1)]] += 1
+
+        picked = []
+        for cls, quota in zip(pools, quotas.tolist()):
+            picked.extend(take(pools[cls], quota))
+        return picked
+
+    blocks = np.arange(0, len(rows), block_size)
+    for start in rng.permutation(blocks):
+        block = slice(start, start + block_size)
+        for row, cls in zip(rows[block].tolist(), labels[block].tolist()):
+            pools[cls].append(row)
+        buffered += len(rows[block])
+
+        while buffered >= shuffle_buffer:
+            picked = draw(batch_size)
+            buffered -= len(picked)
+            yield store.batch(rng.permutation(picked))
+
+    while buffered > 0:
+        picked = draw(batch_size)
+        if not picked:
+            break
+        buffered -= len(picked)
+        if drop_last and len(picked) < batch_size:
+            break
+        yield store.batch(rng.permutation(picked))
+
+if __name__ == "__main__":
+    compile_feature_store()
+
+    store = FeatureStore()
+    train_rows, val_rows = train_val_split(store)
+    print(f"📂 Train rows: {len(train_rows)}, validation rows: {len(val_rows)}")
+
+    first = next(iter_batches(store, train_rows, batch_size=32, seed=0), None)
+    if first is not None:
+        print(f"🔍 First batch: features {first['features'].shape}, labels {np.bincount(first['label'] + 1)}")